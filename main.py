@@ -1,18 +1,34 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import feedparser
+from lxml import etree
 from datetime import datetime
 import time
 import sqlite3
-import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import heapq
+import orjson
+import hashlib
+from collections import OrderedDict
+from urllib.parse import urlsplit
 import os
-from typing import Dict, List, Optional
+import sys
+from io import BytesIO
+from typing import Dict, Iterator, List, Optional, Tuple
 from loguru import logger
 
 # Configure loguru
 logger.remove()
-logger.add("rss_monitor.log", rotation="1 day", retention="7 days", 
+# File writes happen on loguru's own worker thread, off the monitor loop
+logger.add("rss_monitor.log", rotation="1 day", retention="7 days", enqueue=True,
           format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}", level="INFO")
-logger.add(lambda msg: print(msg, end=""), format="{message}", level="INFO")
+# Console output only when attached to a terminal; daemonized runs log to the file alone
+if sys.stderr.isatty():
+    # Fetch status records carry a bound "feed" and get a console timestamp from loguru itself
+    logger.add(sys.stderr, level="INFO",
+              format=lambda record: "[{time:YYYY-MM-DD HH:mm:ss}] {message}\n" if "feed" in record["extra"] else "{message}\n")
 
 class ConfigManager:
     def __init__(self, config_file: str = "config.json"):
@@ -22,8 +38,8 @@ class ConfigManager:
     def load_config(self) -> Dict:
         try:
             if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
+                with open(self.config_file, 'rb') as f:
+                    config = orjson.loads(f.read())
                 logger.info(f"📋 Configuration loaded: {self.config_file}")
                 return config
             else:
@@ -69,256 +85,693 @@ class ConfigManager:
     
     def get_monitoring_interval(self) -> int:
         return self.config.get("monitoring_interval", 1)
+    
+    def get_max_monitoring_interval(self) -> Optional[int]:
+        return self.config.get("max_monitoring_interval")
+    
+    def get_max_concurrent_fetches(self) -> int:
+        return self.config.get("max_concurrent_fetches", 16)
 
 class DatabaseManager:
+    # Hot-path statements are kept as constants so the connection's statement cache always hits;
+    # guid lists are bound as one JSON array so the statement text never varies with their length
+    _SQL_GET_ITEMS = '''SELECT guid, title, link, description, published FROM items
+        WHERE feed_id = ? AND guid IN (SELECT value FROM json_each(?))'''
+    _SQL_UPSERT_ITEM = '''INSERT INTO items (feed_id, guid, title, link, description, published, first_seen, last_seen)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(feed_id, guid) DO UPDATE SET title = excluded.title, link = excluded.link,
+            description = excluded.description, published = excluded.published, last_seen = excluded.last_seen
+        WHERE items.title IS NOT excluded.title OR items.link IS NOT excluded.link
+            OR items.description IS NOT excluded.description'''
+    _SQL_TOUCH_ITEMS = '''UPDATE items SET last_seen = ?
+        WHERE feed_id = ? AND guid IN (SELECT value FROM json_each(?))'''
+    _SQL_LOAD_FEED_ITEMS = '''SELECT guid, title, link, description FROM items
+        WHERE feed_id = ? ORDER BY id DESC LIMIT ?'''
+    _SQL_COUNT_ITEMS = 'SELECT COUNT(*) FROM items WHERE feed_id = ?'
+    _SQL_UPDATE_VALIDATORS = 'UPDATE feeds SET etag = ?, last_modified = ? WHERE id = ?'
+    _SQL_UPDATE_FEED_STATE = 'UPDATE feeds SET etag = ?, last_modified = ?, body_sha = ?, parser = ? WHERE id = ?'
+    
     def __init__(self, db_file: str = "rss_monitor.db"):
         self.db_file = db_file
+        self.lock = threading.RLock()
+        self.conn = self._connect()
         self.init_database()
     
+    def _connect(self) -> sqlite3.Connection:
+        # One long-lived autocommit connection shared by every method, guarded by self.lock
+        conn = sqlite3.connect(self.db_file, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-64000")
+        conn.execute("PRAGMA mmap_size=268435456")
+        return conn
+    
     def init_database(self):
         try:
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            
-            cursor.execute('''CREATE TABLE IF NOT EXISTS feeds (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL, 
-                url TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-            
-            cursor.execute('''CREATE TABLE IF NOT EXISTS items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, feed_id INTEGER NOT NULL, guid TEXT NOT NULL,
-                title TEXT NOT NULL, link TEXT NOT NULL, description TEXT, published TEXT,
-                first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP, last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (feed_id) REFERENCES feeds (id), UNIQUE(feed_id, guid))''')
-            
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_items_guid ON items (guid)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_items_feed_id ON items (feed_id)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_items_last_seen ON items (last_seen)')
-            
-            conn.commit()
-            conn.close()
-            logger.info(f"💾 Database initialized: {self.db_file}")
+            with self.lock:
+                cursor = self.conn.cursor()
+                cursor.execute("PRAGMA journal_mode=WAL")
+                journal_mode = cursor.fetchone()[0]
+                
+                cursor.execute('''CREATE TABLE IF NOT EXISTS feeds (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL, 
+                    url TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+                self._add_missing_columns(cursor, 'feeds', {'etag': 'TEXT', 'last_modified': 'TEXT', 'body_sha': 'TEXT', 'parser': 'TEXT'})
+                
+                cursor.execute('''CREATE TABLE IF NOT EXISTS items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, feed_id INTEGER NOT NULL, guid TEXT NOT NULL,
+                    title TEXT NOT NULL, link TEXT NOT NULL, description TEXT, published TEXT,
+                    first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP, last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (feed_id) REFERENCES feeds (id), UNIQUE(feed_id, guid))''')
+                
+                # Lookups by (feed_id, guid) use the UNIQUE(feed_id, guid) index. The feed_id index also
+                # carries the rowid, so it serves the startup "newest items first" scan without a sort;
+                # the other legacy indexes would only add work to each write
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_items_feed_id ON items (feed_id)')
+                for index in ('idx_items_guid', 'idx_items_last_seen'):
+                    cursor.execute(f'DROP INDEX IF EXISTS {index}')
+            logger.info(f"💾 Database initialized: {self.db_file} (journal_mode={journal_mode})")
         except Exception as e:
             logger.error(f"❌ Database initialization error: {e}")
     
+    def _add_missing_columns(self, cursor: sqlite3.Cursor, table: str, columns: Dict[str, str]):
+        # Migrates databases created by older versions in place
+        cursor.execute(f'PRAGMA table_info({table})')
+        existing = {row[1] for row in cursor.fetchall()}
+        for name, column_type in columns.items():
+            if name not in existing:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}')
+    
     def get_or_create_feed(self, name: str, url: str) -> int:
         try:
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            cursor.execute('SELECT id FROM feeds WHERE name = ?', (name,))
-            result = cursor.fetchone()
-            
-            if result:
-                feed_id = result[0]
-            else:
+            with self.lock:
+                cursor = self.conn.cursor()
+                cursor.execute('SELECT id, url FROM feeds WHERE name = ?', (name,))
+                result = cursor.fetchone()
+                
+                if result:
+                    if result[1] != url:
+                        # Cached validators and body hash belong to the old URL
+                        cursor.execute('''UPDATE feeds SET url = ?, etag = NULL, last_modified = NULL, body_sha = NULL
+                            WHERE id = ?''', (url, result[0]))
+                    return result[0]
                 cursor.execute('INSERT INTO feeds (name, url) VALUES (?, ?)', (name, url))
-                feed_id = cursor.lastrowid
-            
-            conn.commit()
-            conn.close()
-            return feed_id
+                return cursor.lastrowid
         except Exception as e:
             logger.error(f"❌ Database error getting/creating feed: {e}")
             return None
     
-    def get_item_history(self, feed_id: int, guid: str) -> Optional[Dict]:
+    def get_feed_state(self, feed_id: int) -> Dict:
         try:
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            cursor.execute('''SELECT title, link, description, published, first_seen, last_seen 
-                FROM items WHERE feed_id = ? AND guid = ?''', (feed_id, guid))
-            result = cursor.fetchone()
-            conn.close()
-            
+            with self.lock:
+                cursor = self.conn.cursor()
+                cursor.execute('SELECT etag, last_modified, body_sha, parser FROM feeds WHERE id = ?', (feed_id,))
+                result = cursor.fetchone()
             if result:
-                return {'title': result[0], 'link': result[1], 'description': result[2],
-                       'published': result[3], 'first_seen': result[4], 'last_seen': result[5]}
-            return None
+                return {'etag': result[0], 'last_modified': result[1], 'body_sha': result[2], 'parser': result[3]}
         except Exception as e:
-            logger.error(f"❌ Database error getting item: {e}")
-            return None
+            logger.error(f"❌ Database error getting feed state: {e}")
+        return {'etag': None, 'last_modified': None, 'body_sha': None, 'parser': None}
     
-    def save_item(self, feed_id: int, guid: str, title: str, link: str, description: str, published: str, is_new: bool = False):
+    def update_feed_validators(self, feed_id: int, etag: Optional[str], last_modified: Optional[str]):
         try:
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            current_time = datetime.now().isoformat()
-            
-            if is_new:
-                cursor.execute('''INSERT INTO items (feed_id, guid, title, link, description, published, first_seen, last_seen)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', (feed_id, guid, title, link, description, published, current_time, current_time))
-            else:
-                cursor.execute('''UPDATE items SET title = ?, link = ?, description = ?, published = ?, last_seen = ?
-                    WHERE feed_id = ? AND guid = ?''', (title, link, description, published, current_time, feed_id, guid))
-            
-            conn.commit()
-            conn.close()
+            with self.lock:
+                self.conn.execute(self._SQL_UPDATE_VALIDATORS, (etag, last_modified, feed_id))
+        except Exception as e:
+            logger.error(f"❌ Database error saving feed validators: {e}")
+    
+    def update_feed_state(self, feed_id: int, etag: Optional[str], last_modified: Optional[str],
+                          body_sha: Optional[str], parser: Optional[str]):
+        with self.lock:
+            self.conn.execute(self._SQL_UPDATE_FEED_STATE, (etag, last_modified, body_sha, parser, feed_id))
+    
+    def get_items(self, feed_id: int, guids: List[str]) -> Dict[str, tuple]:
+        """Map guid -> (title, link, description, published) for the stored items among guids"""
+        try:
+            with self.lock:
+                cursor = self.conn.cursor()
+                cursor.execute(self._SQL_GET_ITEMS, (feed_id, orjson.dumps(guids).decode()))
+                rows = cursor.fetchall()
+            return {row[0]: row[1:] for row in rows}
+        except Exception as e:
+            logger.error(f"❌ Database error getting items: {e}")
+            return {}
+    
+    def load_feed_items(self, feed_id: int, limit: int) -> Dict[str, tuple]:
+        """Map guid -> (title, link, description) for the feed's most recently added items, oldest first"""
+        try:
+            with self.lock:
+                cursor = self.conn.cursor()
+                cursor.execute(self._SQL_LOAD_FEED_ITEMS, (feed_id, limit))
+                rows = cursor.fetchall()
+            return {row[0]: row[1:] for row in reversed(rows)}
         except Exception as e:
-            logger.error(f"❌ Database error saving item: {e}")
+            logger.error(f"❌ Database error loading items: {e}")
+            return {}
+    
+    def begin(self):
+        # Holds the lock until commit()/rollback() so a batch is not interleaved with other writers.
+        # The writes used inside a batch (update_feed_state, bulk_upsert_items, touch_items) let
+        # errors propagate so the caller can roll the whole batch back
+        self.lock.acquire()
+        try:
+            self.conn.execute('BEGIN IMMEDIATE')
+        except Exception:
+            self.lock.release()
+            raise
+    
+    def commit(self):
+        try:
+            self.conn.execute('COMMIT')
+        except Exception:
+            # A failed COMMIT can leave the transaction open; never hand the lock on mid-transaction
+            if self.conn.in_transaction:
+                self.conn.execute('ROLLBACK')
+            raise
+        finally:
+            self.lock.release()
+    
+    def rollback(self):
+        try:
+            self.conn.execute('ROLLBACK')
+        finally:
+            self.lock.release()
+    
+    def bulk_upsert_items(self, feed_id: int, rows: List[tuple], seen_at: str):
+        """Upsert (guid, title, link, description, published) rows for a feed in one executemany call"""
+        with self.lock:
+            self.conn.executemany(self._SQL_UPSERT_ITEM, ((feed_id, *row, seen_at, seen_at) for row in rows))
+    
+    def touch_items(self, feed_id: int, guids: List[str], seen_at: str):
+        """Refresh last_seen for items whose content did not change"""
+        if not guids:
+            return
+        with self.lock:
+            self.conn.execute(self._SQL_TOUCH_ITEMS, (seen_at, feed_id, orjson.dumps(guids).decode()))
     
     def get_feed_stats(self, feed_id: int) -> Dict:
         try:
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM items WHERE feed_id = ?', (feed_id,))
-            total_items = cursor.fetchone()[0]
-            conn.close()
+            with self.lock:
+                cursor = self.conn.cursor()
+                cursor.execute(self._SQL_COUNT_ITEMS, (feed_id,))
+                total_items = cursor.fetchone()[0]
             return {'total_items': total_items}
         except Exception as e:
             logger.error(f"❌ Database error getting stats: {e}")
             return {'total_items': 0}
+    
+    def optimize(self):
+        try:
+            with self.lock:
+                self.conn.execute("PRAGMA optimize")
+        except Exception as e:
+            logger.error(f"❌ Database error running optimize: {e}")
+    
+    def close(self):
+        # Closing the last connection checkpoints the WAL back into the main database file
+        try:
+            with self.lock:
+                self.conn.execute("PRAGMA optimize")
+                self.conn.close()
+        except Exception as e:
+            logger.error(f"❌ Database error closing connection: {e}")
 
 class DiscordWebhook:
-    def __init__(self, webhook_urls: List[str]):
+    # Discord accepts up to 10 embeds and 6000 embed characters per message
+    MAX_EMBEDS_PER_MESSAGE = 10
+    MAX_FIELDS_PER_EMBED = 10
+    MAX_CHARS_PER_EMBED = 5000
+    # Discord rejects the whole message if any one of these is exceeded
+    MAX_TITLE_CHARS = 256
+    MAX_FIELD_NAME_CHARS = 256
+    MAX_FIELD_VALUE_CHARS = 1024
+    MAX_CHARS_PER_MESSAGE = 6000
+    MAX_RATE_LIMIT_RETRIES = 3
+    # Payloads are pre-serialized with orjson, so the content type is set by hand
+    JSON_HEADERS = {"Content-Type": "application/json"}
+    
+    def __init__(self, webhook_urls: List[str], session: requests.Session):
         self.webhook_urls = webhook_urls
+        self.session = session
+        self.pool = ThreadPoolExecutor(max_workers=max(1, min(4, len(webhook_urls))))
+        # Single worker so flushed batches reach Discord in order without blocking the monitor loop
+        self.dispatcher = ThreadPoolExecutor(max_workers=1)
+        # (label, embed) pairs queued by send_notification until the next flush()
+        self.pending = []
+    
+    def _post(self, webhook_url: str, data: bytes) -> bool:
+        try:
+            for _ in range(self.MAX_RATE_LIMIT_RETRIES + 1):
+                response = self.session.post(webhook_url, data=data, headers=self.JSON_HEADERS,
+                                      proxies=PROXIES, timeout=10)
+                reset_after = self._reset_after(response)
+                if response.status_code == 204:
+                    # Bucket exhausted: wait here rather than have the next post bounce off a 429
+                    if response.headers.get("X-RateLimit-Remaining") == "0":
+                        time.sleep(reset_after)
+                    return True
+                if response.status_code != 429:
+                    break
+                logger.warning(f"⚠️ Discord webhook rate limited, retrying in {reset_after}s")
+                time.sleep(reset_after)
+            logger.warning(f"⚠️ Discord webhook failed: {response.status_code}")
+        except Exception as e:
+            logger.error(f"❌ Discord webhook error: {e}")
+        return False
+    
+    def _reset_after(self, response: requests.Response) -> float:
+        try:
+            return float(response.headers.get("X-RateLimit-Reset-After") or response.headers.get("Retry-After") or 1)
+        except ValueError:
+            return 1.0
+    
+    @staticmethod
+    def _truncate(text: str, limit: int = 200) -> str:
+        # The ellipsis counts towards the limit so the result always fits
+        return text if len(text) <= limit else text[:limit - 3] + "..."
+    
+    def _field_value(self, description: str, link: str) -> str:
+        # Only the description is shortened so the link markdown is never cut mid-way
+        link_line = f"\n🔗 [Read More]({link})"
+        room = self.MAX_FIELD_VALUE_CHARS - len(link_line)
+        if room < 3:
+            # A link too long to fit at all is dropped rather than sent broken
+            return self._truncate(description)
+        return self._truncate(description, min(200, room)) + link_line
+    
+    def _embed_size(self, embed: Dict) -> int:
+        return (len(embed["title"]) + len(embed["description"]) +
+                sum(len(field["name"]) + len(field["value"]) for field in embed["fields"]))
         
     def send_notification(self, feed_name: str, items: List[Dict], change_type: str):
+        """Queue embeds for the given items, split to fit Discord's limits; they are posted on the next flush()"""
         if not items or not self.webhook_urls:
             return
         
         try:
-            embed = {
-                "title": f"🔄 RSS Feed Update - {feed_name}",
-                "description": f"**{change_type.upper()}** items detected",
-                "color": 0x00ff00 if change_type == "new" else 0xffa500,
-                "timestamp": datetime.now().isoformat(),
-                "fields": []
-            }
+            label = f"{feed_name} - {change_type}"
+            title = self._truncate(f"🔄 RSS Feed Update - {feed_name}", self.MAX_TITLE_CHARS)
+            description = f"**{change_type.upper()}** items detected"
+            header_chars = len(title) + len(description)
             
+            embed, embed_chars = None, 0
+            key = 'item' if change_type == "new" else 'new'
             for item in items:
-                if change_type == "new":
-                    title, description, link = item['item']['title'], item['item']['description'][:200], item['item']['link']
-                else:
-                    title, description, link = item['new']['title'], item['new']['description'][:200], item['new']['link']
-                
-                if len(description) > 200:
-                    description = description + "..."
-                
-                embed["fields"].append({
-                    "name": f"📰 {title}",
-                    "value": f"{description}\n🔗 [Read More]({link})",
+                it = item[key]
+                field = {
+                    "name": self._truncate(f"📰 {it['title']}", self.MAX_FIELD_NAME_CHARS),
+                    "value": self._field_value(it['description'], it['link']),
                     "inline": False
-                })
-            
-            payload = {"embeds": [embed], "username": "Monitor Bot"}
-            
-            # Send to all webhooks
-            success_count = 0
-            for webhook_url in self.webhook_urls:
-                try:
-                    response = requests.post(webhook_url, json=payload, headers={"Content-Type": "application/json"}, 
-                                          proxies=PROXIES, timeout=10)
-                    
-                    if response.status_code == 204:
-                        success_count += 1
-                    else:
-                        logger.warning(f"⚠️ Discord webhook failed: {response.status_code}")
-                except Exception as e:
-                    logger.error(f"❌ Discord webhook error: {e}")
-            
-            if success_count > 0:
-                logger.info(f"✅ Discord: {feed_name} - {change_type} (sent to {success_count}/{len(self.webhook_urls)} webhooks)")
+                }
+                field_chars = len(field["name"]) + len(field["value"])
+                if (embed is None or len(embed["fields"]) == self.MAX_FIELDS_PER_EMBED or
+                        embed_chars + field_chars > self.MAX_CHARS_PER_EMBED):
+                    embed = {
+                        "title": title,
+                        "description": description,
+                        "color": 0x00ff00 if change_type == "new" else 0xffa500,
+                        "fields": []
+                    }
+                    embed_chars = header_chars
+                    self.pending.append((label, embed))
+                embed["fields"].append(field)
+                embed_chars += field_chars
         except Exception as e:
             logger.error(f"❌ Discord error: {e}")
+    
+    def flush(self):
+        """Hand queued embeds to the background dispatcher and return immediately"""
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        # Everything in one flush was detected in the same monitoring pass; stamped now, not when
+        # the dispatcher gets to it after earlier batches' rate-limit waits
+        self.dispatcher.submit(self._deliver, pending, datetime.now().isoformat())
+    
+    def _deliver(self, pending: List[tuple], timestamp: str):
+        """Post embeds, packing as many as Discord allows into each message"""
+        batches, batch, batch_chars = [], [], 0
+        for label, embed in pending:
+            embed["timestamp"] = timestamp
+            size = self._embed_size(embed)
+            if batch and (len(batch) == self.MAX_EMBEDS_PER_MESSAGE or batch_chars + size > self.MAX_CHARS_PER_MESSAGE):
+                batches.append(batch)
+                batch, batch_chars = [], 0
+            batch.append((label, embed))
+            batch_chars += size
+        if batch:
+            batches.append(batch)
+        
+        for batch in batches:
+            try:
+                # Serialized once and shared by every webhook post
+                data = orjson.dumps({"embeds": [embed for _, embed in batch], "username": "Monitor Bot"})
+                
+                # Send to all webhooks concurrently
+                results = self.pool.map(lambda webhook_url: self._post(webhook_url, data), self.webhook_urls)
+                success_count = sum(results)
+                
+                if success_count > 0:
+                    labels = ", ".join(dict.fromkeys(label for label, _ in batch))
+                    logger.info(f"✅ Discord: {labels} (sent to {success_count}/{len(self.webhook_urls)} webhooks)")
+            except Exception as e:
+                logger.error(f"❌ Discord error: {e}")
+    
+    def close(self):
+        """Deliver anything already flushed, then release the worker threads"""
+        self.dispatcher.shutdown(wait=True)
+        self.pool.shutdown(wait=True)
+
+class EntryParser:
+    """Turns a feed body into (guid, title, link, description, published) tuples"""
+    ATOM_NS = "{http://www.w3.org/2005/Atom}"
+    RSS1_NS = "{http://purl.org/rss/1.0/}"
+    RDF_ABOUT = "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about"
+    RDF_ROOT = "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}RDF"
+    CONTENT_ENCODED = "{http://purl.org/rss/1.0/modules/content/}encoded"
+    
+    def parse(self, content: bytes, headers: Optional[Dict[str, str]] = None) -> Tuple[str, List[tuple]]:
+        """Return (parser_name, entries), preferring lxml and falling back to feedparser"""
+        try:
+            events = self._iterparse(content)
+            entries = list(self._parse_with_lxml(events))
+            # A feed lxml understands that simply has no items right now is not a reason to switch parsers
+            if entries or self._is_feed_root(events.root):
+                return "lxml", entries
+        except (etree.XMLSyntaxError, ValueError):
+            pass
+        return "feedparser", self._parse_with_feedparser(content, headers or {})
+    
+    def _iterparse(self, content: bytes) -> etree.iterparse:
+        # Streamed so only the current entry is ever materialised, not the whole document tree
+        return etree.iterparse(BytesIO(content), events=('end',),
+                               tag=('item', f'{self.RSS1_NS}item', f'{self.ATOM_NS}entry'),
+                               resolve_entities=False, no_network=True)
+    
+    def _is_feed_root(self, root) -> bool:
+        if root is None:
+            return False
+        if root.tag == self.RDF_ROOT:
+            return root.find(f'{self.RSS1_NS}channel') is not None
+        return root.tag in ('rss', f'{self.ATOM_NS}feed')
+    
+    def _parse_with_lxml(self, events: etree.iterparse) -> Iterator[tuple]:
+        rss1, atom = self.RSS1_NS, self.ATOM_NS
+        for _, element in events:
+            if element.tag == 'item':
+                guid, link = self._text(element, 'guid'), self._text(element, 'link')
+                # Like feedparser, a permalink guid stands in for a missing <link>
+                if not link and guid and element.find('guid').get('isPermaLink', 'true').lower() != 'false':
+                    link = guid
+                description = self._text(element, 'description') or self._text(element, self.CONTENT_ENCODED)
+                yield (guid or link, self._text(element, 'title'), link, description, self._text(element, 'pubDate'))
+            elif element.tag == f'{rss1}item':
+                # RSS 1.0 (RDF); dc:date is not a publish date as far as feedparser is concerned
+                link = self._text(element, f'{rss1}link')
+                yield (element.get(self.RDF_ABOUT) or link, self._text(element, f'{rss1}title'), link,
+                       self._text(element, f'{rss1}description'), '')
+            else:
+                link = ''
+                for link_element in element.iterfind(f'{atom}link'):
+                    if link_element.get('rel', 'alternate') == 'alternate':
+                        link = link_element.get('href', '')
+                        break
+                description = self._text(element, f'{atom}summary') or self._text(element, f'{atom}content')
+                yield (self._text(element, f'{atom}id') or link, self._text(element, f'{atom}title'), link,
+                       description, self._text(element, f'{atom}published'))
+            
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+    
+    def _text(self, element, path: str) -> str:
+        child = element.find(path)
+        if child is None:
+            return ''
+        if child.get('type') == 'xhtml':
+            # Inline XHTML needs feedparser's handling to match what it stored before
+            raise ValueError("xhtml content")
+        # itertext() also covers unresolved entities and markup children, which .text stops at
+        return ''.join(child.itertext()).strip()
+    
+    def _parse_with_feedparser(self, content: bytes, headers: Dict[str, str]) -> List[tuple]:
+        # The HTTP content type gives feedparser the charset up front instead of leaving it to guess;
+        # content-encoding is left out because requests has already decompressed the body
+        response_headers = {'content-type': headers['content-type']} if 'content-type' in headers else {}
+        return [(entry.get('guid') or entry.get('link', ''), entry.get('title', ''), entry.get('link', ''),
+                 entry.get('description', ''), entry.get('published', ''))
+                for entry in feedparser.parse(content, response_headers=response_headers).entries]
 
 class RSSFeed:
-    def __init__(self, name: str, url: str, db_manager: DatabaseManager):
+    SEEN_CACHE_SIZE = 5000
+    CHANGE_GAP_WEIGHT = 0.1
+    
+    def __init__(self, name: str, url: str, db_manager: DatabaseManager, interval: float,
+                 max_interval: Optional[float] = None):
         self.name = name
+        self.padded_name = name
         self.url = url
+        # Polling adapts between the configured interval and max_interval (fixed when they are equal)
+        self.interval = self.min_interval = interval
+        self.max_interval = max(interval, max_interval or interval)
+        self.change_gap = interval
+        self.last_change_at = time.monotonic()
         self.db_manager = db_manager
         self.feed_id = db_manager.get_or_create_feed(name, url)
         self.stats = db_manager.get_feed_stats(self.feed_id)
         
+        state = db_manager.get_feed_state(self.feed_id)
+        self.etag = state['etag']
+        self.last_modified = state['last_modified']
+        self.body_sha = state['body_sha']
+        self.parser = state['parser']
+        # guid -> content_digest() of the item as last stored, oldest first; primed in one query
+        # so the first refresh after a restart does not have to look every entry up
+        self.seen = OrderedDict(
+            (guid, self.content_digest(*item))
+            for guid, item in db_manager.load_feed_items(self.feed_id, self.SEEN_CACHE_SIZE).items())
+        # While the cache holds every stored guid, a guid missing from it is definitely new
+        self.seen_complete = len(self.seen) >= self.stats['total_items']
+        
         if not self.feed_id:
             logger.error(f"❌ {self.name}: failed to initialize")
+    
+    def adapt_interval(self, changed: bool, now: float):
+        """Move the polling interval towards the feed's average gap between changes"""
+        elapsed = now - self.last_change_at
+        if changed:
+            self.change_gap += self.CHANGE_GAP_WEIGHT * (elapsed - self.change_gap)
+            self.last_change_at = now
+            elapsed = 0
+        # The time since the last change is a lower bound on the current gap, so quiet feeds back off
+        self.interval = min(max(self.change_gap, elapsed, self.min_interval), self.max_interval)
+    
+    @staticmethod
+    def content_digest(title: str, link: str, description: str) -> bytes:
+        # A 16-byte digest keeps the cache small no matter how long descriptions are
+        return hashlib.blake2b(f"{title}\0{link}\0{description}".encode("utf-8", "surrogatepass"), digest_size=16).digest()
 
 class RSSMonitorService:
+    OPTIMIZE_INTERVAL = 15 * 60
+    
     def __init__(self, config_manager: ConfigManager):
         self.config = config_manager
         self.db_manager = DatabaseManager()
-        self.discord = DiscordWebhook(config_manager.get_discord_webhooks())
+        self.entry_parser = EntryParser()
+        
+        # Shared keep-alive session so repeated polls and webhook posts reuse pooled connections.
+        # Size it so no host's pool is evicted and no concurrent fetch has to drop its connection.
+        hosts = {urlsplit(url).netloc for url in
+                 [feed["url"] for feed in config_manager.get_feeds()] + config_manager.get_discord_webhooks()}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(32, len(hosts)),
+                              pool_maxsize=max(32, config_manager.get_max_concurrent_fetches()),
+                              max_retries=Retry(total=2, backoff_factor=0.3))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        self.discord = DiscordWebhook(config_manager.get_discord_webhooks(), self.session)
         
         self.feeds = []
+        default_interval = config_manager.get_monitoring_interval()
+        default_max_interval = config_manager.get_max_monitoring_interval()
         for feed_config in config_manager.get_feeds():
-            feed = RSSFeed(feed_config["name"], feed_config["url"], self.db_manager)
+            feed = RSSFeed(feed_config["name"], feed_config["url"], self.db_manager,
+                           feed_config.get("monitoring_interval", default_interval),
+                           feed_config.get("max_monitoring_interval", default_max_interval))
             self.feeds.append(feed)
         
+        # Alignment for log_fetch_status is fixed once the feed list is known
+        self._max_feed_len = max((len(feed.name) for feed in self.feeds), default=10)
+        self._max_dt_len = 20  # Approximate max length for data types
+        for feed in self.feeds:
+            feed.padded_name = feed.name.ljust(self._max_feed_len)
+        
+        # Fetches are I/O bound; results are processed on the monitor thread so DB writes stay serialized
+        max_workers = min(config_manager.get_max_concurrent_fetches(), len(self.feeds))
+        self.pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        
         global PROXIES
         PROXIES = config_manager.get_proxies()
     
-    def log_fetch_status(self, feed_name: str, data_type: str, status: str, icon: str = "📡"):
+    def log_fetch_status(self, feed: RSSFeed, data_type: str, status: str, icon: str = "📡"):
         """Log fetch status with proper alignment and timestamp"""
-        # Calculate padding to align status messages
-        max_feed_length = max(len(feed.name) for feed in self.feeds) if self.feeds else 10
-        max_data_type_length = 20  # Approximate max length for data types
-        
-        # Pad feed name and data type for alignment
-        padded_feed = feed_name.ljust(max_feed_length)
-        padded_data_type = data_type.ljust(max_data_type_length)
+        # Feed names are padded once in __init__; only the data type is padded here
+        padded_feed = feed.padded_name
+        padded_data_type = data_type.ljust(self._max_dt_len)
         
         # Choose status icon and format
         if status == "SUCCESS":
             status_icon = "✅"
             status_text = f"SUCCESS {status_icon}"
+        elif status == "NOT MODIFIED":
+            status_icon = "💤"
+            status_text = f"CACHED  {status_icon}"
         else:
             status_icon = "❌"
             status_text = f"FAILED  {status_icon}"
         
-        # Get current timestamp with date and time
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Formatting and the timestamp are left to loguru's sinks
+        logger.bind(feed=feed.name).info("{icon} Fetching {padded_feed} {data_type}... {status}",
+                                         icon=icon, padded_feed=padded_feed, data_type=padded_data_type, status=status_text)
         
-        # Format the log message with timestamp and reduced spacing
-        log_message = f"[{current_time}] {icon} Fetching {padded_feed} {padded_data_type}... {status_text}"
-        logger.info(log_message)
-        
-    def fetch_rss(self, feed: RSSFeed) -> Optional[feedparser.FeedParserDict]:
+    def save_validators(self, feed: RSSFeed, etag: Optional[str], last_modified: Optional[str]):
+        if (etag, last_modified) != (feed.etag, feed.last_modified):
+            feed.etag, feed.last_modified = etag, last_modified
+            self.db_manager.update_feed_validators(feed.feed_id, etag, last_modified)
+    
+    def fetch_rss(self, feed: RSSFeed) -> Optional[Tuple[str, List[tuple], Dict]]:
         try:
-            response = requests.get(feed.url, proxies=PROXIES, timeout=10)
-            if response.status_code == 200:
-                self.log_fetch_status(feed.name, "RSS Feed", "SUCCESS")
-                return feedparser.parse(response.content)
+            # Conditional GET: servers answer 304 with no body when the feed is unchanged
+            headers = {}
+            if feed.etag:
+                headers["If-None-Match"] = feed.etag
+            if feed.last_modified:
+                headers["If-Modified-Since"] = feed.last_modified
+            
+            response = self.session.get(feed.url, headers=headers, proxies=PROXIES, timeout=10)
+            if response.status_code == 304:
+                # A 304 may still carry refreshed validators
+                self.save_validators(feed, response.headers.get("ETag", feed.etag),
+                                     response.headers.get("Last-Modified", feed.last_modified))
+                self.log_fetch_status(feed, "RSS Feed", "NOT MODIFIED")
+                return None
+            elif response.status_code == 200:
+                etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+                
+                # Servers without validators often still return a byte-identical body
+                body_sha = hashlib.blake2b(response.content, digest_size=16).hexdigest()
+                if body_sha == feed.body_sha:
+                    self.save_validators(feed, etag, last_modified)
+                    self.log_fetch_status(feed, "RSS Feed", "NOT MODIFIED")
+                    return None
+                
+                self.log_fetch_status(feed, "RSS Feed", "SUCCESS")
+                parser, entries = self.entry_parser.parse(response.content, response.headers)
+                # Only adopted by compare_and_update once the items it describes are committed
+                state = {'etag': etag, 'last_modified': last_modified, 'body_sha': body_sha}
+                return parser, entries, state
             else:
-                self.log_fetch_status(feed.name, "RSS Feed", f"HTTP {response.status_code}")
+                self.log_fetch_status(feed, "RSS Feed", f"HTTP {response.status_code}")
                 return None
         except requests.exceptions.RequestException:
-            self.log_fetch_status(feed.name, "RSS Feed", "Network Error")
+            self.log_fetch_status(feed, "RSS Feed", "Network Error")
             return None
         except Exception:
-            self.log_fetch_status(feed.name, "RSS Feed", "Parse Error")
+            self.log_fetch_status(feed, "RSS Feed", "Parse Error")
             return None
     
-    def compare_and_update(self, feed: RSSFeed, rss_data: feedparser.FeedParserDict) -> Dict[str, List]:
+    def compare_and_update(self, feed: RSSFeed, entries: List[tuple], parser: str, state: Dict) -> Dict[str, List]:
         changes = {'new_items': [], 'updated_items': [], 'unchanged_items': []}
+        seen = feed.seen
+        rows = []
+        # guid -> digest for the seen cache, applied only once the refresh is committed
+        stored = {}
+        # One timestamp for the whole refresh
+        seen_at = datetime.now().isoformat()
+        
+        # An empty refresh says nothing about which parser the feed's items come from
+        if not entries:
+            parser = feed.parser
+        # lxml and feedparser normalise text differently (feedparser sanitises HTML); whenever the
+        # parser changes, including for items stored before it was tracked, content differences
+        # are re-synced silently instead of being reported as updates
+        resync = parser != feed.parser
+        resynced = 0
         
-        for entry in rss_data.entries:
-            guid = entry.guid if hasattr(entry, 'guid') else entry.link
-            current_item = {
-                'title': entry.title, 'link': entry.link, 'description': entry.description,
-                'published': entry.published if hasattr(entry, 'published') else ''
-            }
+        # Entries matching the in-memory seen cache are unchanged; only the rest are looked up
+        misses = []
+        for entry in entries:
+            guid, title, link, description, _ = entry
+            digest = feed.content_digest(title, link, description)
+            if seen.get(guid) == digest:
+                seen.move_to_end(guid)
+                changes['unchanged_items'].append(guid)
+            else:
+                misses.append((entry, digest))
+        lookups = [entry[0] for entry, _ in misses if not feed.seen_complete or entry[0] in seen]
+        historical = self.db_manager.get_items(feed.feed_id, lookups) if lookups else {}
+        
+        # Classify on plain tuples; item dicts are only built for entries that produce a notification
+        for (guid, title, link, description, published), digest in misses:
+            if stored.get(guid, seen.get(guid)) == digest:
+                # Repeated guid within this refresh
+                changes['unchanged_items'].append(guid)
+                continue
             
-            historical_item = self.db_manager.get_item_history(feed.feed_id, guid)
+            old = historical.get(guid)
+            stored[guid] = digest
+            # A later copy of this guid in the same body is compared against this one, not the database
+            historical[guid] = (title, link, description, published)
+            if old is not None and old[:3] == (title, link, description):
+                # Unchanged items only need last_seen refreshed, not a full row rewrite
+                changes['unchanged_items'].append(guid)
+                continue
             
-            if historical_item:
-                if (historical_item['title'] != current_item['title'] or 
-                    historical_item['description'] != current_item['description'] or
-                    historical_item['link'] != current_item['link']):
-                    
-                    changes['updated_items'].append({'guid': guid, 'old': historical_item, 'new': current_item})
-                    logger.info(f"🔄 {feed.name}: Updated - {current_item['title']}")
-                    self.db_manager.save_item(feed.feed_id, guid, current_item['title'], 
-                                           current_item['link'], current_item['description'], 
-                                           current_item['published'], is_new=False)
-                else:
-                    changes['unchanged_items'].append(guid)
-                    self.db_manager.save_item(feed.feed_id, guid, current_item['title'], 
-                                           current_item['link'], current_item['description'], 
-                                           current_item['published'], is_new=False)
-            else:
+            current_item = {'title': title, 'link': link, 'description': description, 'published': published}
+            if old is None:
                 changes['new_items'].append({'guid': guid, 'item': current_item})
-                logger.info(f"🆕 {feed.name}: New - {current_item['title']}")
-                self.db_manager.save_item(feed.feed_id, guid, current_item['title'], 
-                                       current_item['link'], current_item['description'], 
-                                       current_item['published'], is_new=True)
+            elif resync:
+                resynced += 1
+            else:
+                historical_item = {'title': old[0], 'link': old[1], 'description': old[2], 'published': old[3]}
+                changes['updated_items'].append({'guid': guid, 'old': historical_item, 'new': current_item})
+            
+            rows.append((guid, title, link, description, published))
+        
+        try:
+            self.db_manager.begin()
+            try:
+                self.db_manager.bulk_upsert_items(feed.feed_id, rows, seen_at)
+                self.db_manager.touch_items(feed.feed_id, changes['unchanged_items'], seen_at)
+                self.db_manager.update_feed_state(feed.feed_id, state['etag'], state['last_modified'],
+                                                  state['body_sha'], parser)
+            except Exception:
+                self.db_manager.rollback()
+                raise
+            self.db_manager.commit()
+        except Exception as e:
+            # Nothing was stored, so nothing is announced; the next fetch re-parses the body and retries
+            logger.error(f"❌ {feed.name}: failed to save refresh: {e}")
+            return {'new_items': [], 'updated_items': [], 'unchanged_items': []}
+        
+        feed.etag, feed.last_modified, feed.body_sha = state['etag'], state['last_modified'], state['body_sha']
+        for guid, digest in stored.items():
+            seen[guid] = digest
+            seen.move_to_end(guid)
+        if len(seen) > feed.SEEN_CACHE_SIZE:
+            feed.seen_complete = False
+            while len(seen) > feed.SEEN_CACHE_SIZE:
+                seen.popitem(last=False)
+        
+        for change in changes['new_items']:
+            logger.info("🆕 {}: New - {}", feed.name, change['item']['title'])
+        for change in changes['updated_items']:
+            logger.info("🔄 {}: Updated - {}", feed.name, change['new']['title'])
+        
+        feed.parser = parser
+        if resynced:
+            logger.info("♻️ {}: Re-synced {} items with the {} parser", feed.name, resynced, parser)
         
         return changes
     
@@ -332,24 +785,59 @@ class RSSMonitorService:
         interval = self.config.get_monitoring_interval()
         
         logger.info(f"🚀 RSS Monitor Started - {len(self.feeds)} feeds")
-        logger.info(f"⏱️ Request Interval: {interval}s")
+        logger.info(f"⏱️ Request Interval: {interval}s (default)")
+        max_interval = self.config.get_max_monitoring_interval()
+        if max_interval:
+            logger.info(f"⏱️ Adaptive Interval: up to {max_interval}s (default)")
         if PROXIES:
             logger.info(f"🌐 Proxy: {PROXIES.get('http', 'N/A')}")
         logger.info("-" * 50)
         
+        last_optimize = time.monotonic()
+        # Min-heap of (next_due, index, feed) on the monotonic clock; index breaks ties between feeds
+        schedule = [(last_optimize, index, feed) for index, feed in enumerate(self.feeds)]
+        heapq.heapify(schedule)
+        in_flight = {}
         try:
             while True:
-                for feed in self.feeds:
-                    rss_data = self.fetch_rss(feed)
-                    if rss_data:
-                        changes = self.compare_and_update(feed, rss_data)
+                now = time.monotonic()
+                while schedule and schedule[0][0] <= now:
+                    due, index, feed = heapq.heappop(schedule)
+                    in_flight[self.pool.submit(self.fetch_rss, feed)] = (due, index, feed)
+                
+                timeout = max(0, schedule[0][0] - now) if schedule else None
+                if not in_flight:
+                    time.sleep(timeout)
+                    continue
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    due, index, feed = in_flight.pop(future)
+                    parsed = future.result()
+                    changed = False
+                    if parsed:
+                        parser, entries, state = parsed
+                        changes = self.compare_and_update(feed, entries, parser, state)
                         self.send_discord_notifications(feed, changes)
                         feed.stats = self.db_manager.get_feed_stats(feed.feed_id)
-                time.sleep(interval)
+                        changed = bool(changes['new_items'] or changes['updated_items'])
+                    feed.adapt_interval(changed, time.monotonic())
+                    # Stay on the feed's own grid; a fetch that overran its slot is simply due again now
+                    heapq.heappush(schedule, (max(due + feed.interval, time.monotonic()), index, feed))
+                self.discord.flush()
+                
+                if time.monotonic() - last_optimize >= self.OPTIMIZE_INTERVAL:
+                    self.db_manager.optimize()
+                    last_optimize = time.monotonic()
         except KeyboardInterrupt:
             logger.info(f"\n🛑 Stopped")
         except Exception as e:
             logger.error(f"❌ Error: {e}")
+        finally:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.discord.close()
+            self.db_manager.close()
+            logger.complete()
 
 if __name__ == "__main__":
     config_manager = ConfigManager()